@@ -1,17 +1,24 @@
-import json
-import csv
+import argparse
+import heapq
+import os
 import time
-from collections import defaultdict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from collections import defaultdict, OrderedDict
 from typing import Dict, List, Tuple, Any
-from web3 import Web3
-from web3.exceptions import BlockNotFound, TransactionNotFound
-import requests
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
+import httpx
+import orjson
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 # Configuration
 ALCHEMY_URL = "https://berachain-mainnet.g.alchemy.com/v2/h6emmq6kC1M6yx7CrQEohQNm6svMt6i1"
 TOTAL_BERA_TOKENS = 34000
+DEBUG = False
 
 # Pool addresses
 POOLS = {
@@ -22,71 +29,313 @@ POOLS = {
     "BABY_BERA": "0x304F9c77C303Eb9445f81Ba6De3d0d516372Ea97"
 }
 
-# SwapNFTOutPair event signature
-SWAP_NFT_OUT_PAIR_TOPIC = Web3.keccak(text="SwapNFTOutPair(uint256,uint256[],uint256)").hex()
+# Collections the airdrop is split across
+COLLECTIONS = ["YEETARD", "BULLA", "BABY_BERA"]
 
-# Initialize Web3
-w3 = Web3(Web3.HTTPProvider(ALCHEMY_URL))
+# SwapNFTOutPair event signature: keccak256("SwapNFTOutPair(uint256,uint256[],uint256)")
+SWAP_NFT_OUT_PAIR_SIGNATURE = "SwapNFTOutPair(uint256,uint256[],uint256)"
+SWAP_NFT_OUT_PAIR_TOPIC = "0xf506468975082788421e0cfe591d415faf7921176896acdaa707638f22549e58"
 
-def get_pool_events(pool_address: str, from_block: int = 0, to_block: int = None) -> List[Dict]:
-    """Fetch SwapNFTOutPair events for a specific pool"""
-    events = []
+# JSON-RPC batching
+RPC_BATCH_SIZE = 100  # Alchemy caps batches at ~1000 requests
+TX_FROM_CACHE_SIZE = 100000
+
+# HTTP connection pooling
+HTTP_POOL_SIZE = 32
+HTTP_TIMEOUT = 60
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Parallel fetching
+SEGMENT_SIZE = 500000  # Blocks handed to each worker at a time
+CHUNK_WORKERS = 8
+POOL_WORKERS = 5
+
+# Adaptive eth_getLogs range sizing
+INITIAL_CHUNK_SIZE = 10000
+MIN_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 50000
+CHUNK_GROWTH_FACTOR = 1.25
+RESPONSE_TOO_LARGE_ERRORS = ("response size", "more than", "too large", "range is too large")
+
+# On-disk log cache
+CACHE_DIR = "cache"
+CONFIRMATIONS = 64  # Only cache blocks this far behind head so reorgs can't invalidate them
+CACHE_SCHEMA = pa.schema([
+    ("block_number", pa.int64()),
+    ("log_index", pa.int64()),
+    ("tx_hash", pa.string()),
+    ("address", pa.string()),
+    ("amount_in", pa.string()),  # Wei amounts can exceed int64
+])
+
+# One persistent HTTP/2 client shared by every worker thread; requests are multiplexed over its connections.
+# Log payloads are hex-heavy and compress well, so always ask for gzip.
+http_client = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=MAX_RETRIES,  # Connection failures only; status codes are retried in post_rpc
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+    ),
+    timeout=HTTP_TIMEOUT,
+    headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+)
+
+def post_rpc(client: httpx.Client, payload: Any) -> Any:
+    """POST a JSON-RPC payload, retrying rate limits and server errors with exponential backoff"""
+    body = orjson.dumps(payload)
+    
+    for attempt in range(MAX_RETRIES + 1):
+        response = client.post(ALCHEMY_URL, content=body)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+            break
+        time.sleep(RETRY_BACKOFF_FACTOR * 2 ** attempt)
+    
+    response.raise_for_status()
+    if DEBUG:
+        print(f"RPC response Content-Encoding: {response.headers.get('Content-Encoding')}")
+    return orjson.loads(response.content)
+
+def rpc_request(client: httpx.Client, method: str, params: List) -> Any:
+    """Make a single JSON-RPC call and return its result"""
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    
+    result = post_rpc(client, payload)
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result["result"]
+
+def get_block_number() -> int:
+    """Return the latest block number"""
+    return int(rpc_request(http_client, "eth_blockNumber", []), 16)
+
+# Transaction hash -> sender, shared across pools since one tx can hit several pools
+tx_from_cache: "OrderedDict[str, str]" = OrderedDict()
+tx_from_cache_lock = threading.Lock()
+
+def get_cached_sender(tx_hash: str):
+    """Look up a sender in the LRU cache, returning None on a miss"""
+    with tx_from_cache_lock:
+        sender = tx_from_cache.get(tx_hash)
+        if sender is not None:
+            tx_from_cache.move_to_end(tx_hash)
+        return sender
+
+def cache_sender(tx_hash: str, sender: str):
+    """Store a sender in the LRU cache, evicting the oldest entry when full"""
+    with tx_from_cache_lock:
+        tx_from_cache[tx_hash] = sender
+        tx_from_cache.move_to_end(tx_hash)
+        if len(tx_from_cache) > TX_FROM_CACHE_SIZE:
+            tx_from_cache.popitem(last=False)
+
+def get_transaction_senders(tx_hashes: List[str]) -> Dict[str, str]:
+    """Resolve the sender of each transaction using batched eth_getTransactionByHash calls"""
+    senders = {}
+    
+    for start in range(0, len(tx_hashes), RPC_BATCH_SIZE):
+        batch = tx_hashes[start:start + RPC_BATCH_SIZE]
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": "eth_getTransactionByHash", "params": [tx_hash]}
+            for i, tx_hash in enumerate(batch)
+        ]
+        
+        # Batch responses may arrive in any order, so match them back by id
+        for result in post_rpc(http_client, payload):
+            if "error" in result or result.get("result") is None:
+                raise ValueError(f"Transaction {batch[result['id']]} not found: {result.get('error')}")
+            senders[batch[result["id"]]] = result["result"]["from"].lower()
     
-    if to_block is None:
-        to_block = w3.eth.block_number
+    return senders
+
+def resolve_senders(tx_hashes: List[str], block_numbers: List[int]) -> Dict[str, str]:
+    """Map each transaction hash to its sender, fetching whole blocks where several logs share one"""
+    senders = {}
+    missing_by_block = defaultdict(set)
+    
+    for tx_hash, block_number in zip(tx_hashes, block_numbers):
+        sender = get_cached_sender(tx_hash)
+        if sender is not None:
+            senders[tx_hash] = sender
+        else:
+            missing_by_block[block_number].add(tx_hash)
     
-    # Process in chunks to avoid rate limits
-    chunk_size = 5000
+    single_tx_hashes = []
+    for block_number, block_tx_hashes in missing_by_block.items():
+        if len(block_tx_hashes) < 2:
+            single_tx_hashes.extend(block_tx_hashes)
+            continue
+        
+        # One block fetch covers every transaction in it
+        block = rpc_request(http_client, "eth_getBlockByNumber", [hex(block_number), True])
+        for tx in block["transactions"]:
+            tx_hash = tx["hash"]
+            if tx_hash in block_tx_hashes:
+                sender = tx["from"].lower()
+                senders[tx_hash] = sender
+                cache_sender(tx_hash, sender)
+    
+    for tx_hash, sender in get_transaction_senders(single_tx_hashes).items():
+        senders[tx_hash] = sender
+        cache_sender(tx_hash, sender)
+    
+    return senders
+
+def decode_amounts(data_fields: List[str]) -> List[int]:
+    """Decode the first 32-byte word of each log's data field in one pass"""
+    raw = bytes.fromhex("".join(data[2:66] for data in data_fields))
+    return [int.from_bytes(raw[i:i + 32], "big") for i in range(0, len(raw), 32)]
+
+def raw_get_logs(client: httpx.Client, pool_address: str, from_block: int, to_block: int) -> List[Dict]:
+    """Call eth_getLogs directly, returning the logs as plain dicts of hex strings"""
+    return rpc_request(client, "eth_getLogs", [{
+        "fromBlock": hex(from_block),
+        "toBlock": hex(to_block),
+        "address": pool_address,
+        "topics": [SWAP_NFT_OUT_PAIR_TOPIC]
+    }])
+
+def fetch_chunk(pool_address: str, start_block: int, end_block: int) -> List[Dict]:
+    """Fetch and decode SwapNFTOutPair events for a single block range"""
+    logs = raw_get_logs(http_client, pool_address, start_block, end_block)
+    
+    tx_hashes = [log["transactionHash"] for log in logs]
+    block_numbers = [int(log["blockNumber"], 16) for log in logs]
+    
+    # Get transaction details to find the senders in as few round-trips as possible
+    senders = resolve_senders(tx_hashes, block_numbers)
+    
+    # Decode the event data (amount_in is the first 32 bytes)
+    amounts_in = decode_amounts([log["data"] for log in logs])
+    
+    events = []
+    for log, tx_hash, block_number, amount_in in zip(logs, tx_hashes, block_numbers, amounts_in):
+        events.append({
+            "pool": pool_address,
+            "tx_hash": tx_hash,
+            "block_number": block_number,
+            "address": senders[tx_hash],
+            "amount_in": amount_in,
+            "log_index": int(log["logIndex"], 16)
+        })
+    
+    return events
+
+def fetch_segment(pool_address: str, from_block: int, to_block: int) -> List[Dict]:
+    """Walk a block range with an adaptively sized window: grow on success, shrink on errors"""
+    events = []
+    chunk_size = INITIAL_CHUNK_SIZE
     current_block = from_block
     
     while current_block <= to_block:
-        end_block = min(current_block + chunk_size, to_block)
+        end_block = min(current_block + chunk_size - 1, to_block)
         
         try:
-            filter_params = {
-                "fromBlock": hex(current_block),
-                "toBlock": hex(end_block),
-                "address": pool_address,
-                "topics": [SWAP_NFT_OUT_PAIR_TOPIC]
-            }
-            
-            logs = w3.eth.get_logs(filter_params)
-            
-            for log in logs:
-                # Decode the event data
-                amount_in = int(log["data"][:66], 16)  # First 32 bytes
-                
-                # Get transaction details to find the sender
-                tx = w3.eth.get_transaction(log["transactionHash"])
-                
-                events.append({
-                    "pool": pool_address,
-                    "tx_hash": log["transactionHash"].hex(),
-                    "block_number": log["blockNumber"],
-                    "address": tx["from"],
-                    "amount_in": amount_in,
-                    "log_index": log["logIndex"]
-                })
-            
-            print(f"Processed blocks {current_block} to {end_block} for pool {pool_address}")
-            current_block = end_block + 1
-            time.sleep(0.1)  # Rate limiting
-            
+            events.extend(fetch_chunk(pool_address, current_block, end_block))
         except Exception as e:
-            print(f"Error processing blocks {current_block} to {end_block}: {e}")
-            time.sleep(1)
+            if any(marker in str(e).lower() for marker in RESPONSE_TOO_LARGE_ERRORS):
+                # Too many logs in this range, split it in half and retry straight away
+                chunk_size = max(MIN_CHUNK_SIZE, (end_block - current_block + 1) // 2)
+                print(f"Response too large for blocks {current_block} to {end_block}, retrying with {chunk_size} blocks")
+            else:
+                chunk_size = max(MIN_CHUNK_SIZE, chunk_size // 2)
+                print(f"Error processing blocks {current_block} to {end_block}: {e}")
+                time.sleep(1)
             continue
+        
+        print(f"Processed blocks {current_block} to {end_block} for pool {pool_address}")
+        current_block = end_block + 1
+        chunk_size = min(MAX_CHUNK_SIZE, int(chunk_size * CHUNK_GROWTH_FACTOR))
     
     return events
 
-def calculate_volumes(all_events: List[Dict]) -> Dict[str, Dict[str, Any]]:
-    """Calculate trading volumes per address and per collection"""
-    address_data = defaultdict(lambda: {
-        "total_volume": 0,
-        "collections": defaultdict(int),
-        "tx_count": 0
-    })
+def get_pool_events(pool_address: str, from_block: int = 0, to_block: int = None) -> List[Dict]:
+    """Fetch SwapNFTOutPair events for a specific pool"""
+    if to_block is None:
+        to_block = get_block_number()
+    
+    # Split the range into segments and walk them concurrently
+    segments = [
+        (start_block, min(start_block + SEGMENT_SIZE - 1, to_block))
+        for start_block in range(from_block, to_block + 1, SEGMENT_SIZE)
+    ]
     
+    events = []
+    with ThreadPoolExecutor(max_workers=CHUNK_WORKERS) as executor:
+        for segment_events in executor.map(lambda segment: fetch_segment(pool_address, *segment), segments):
+            events.extend(segment_events)
+    
+    # Keep output deterministic regardless of completion order
+    events.sort(key=lambda event: (event["block_number"], event["log_index"]))
+    return events
+
+def get_cache_path(pool_address: str) -> str:
+    """Path of the parquet file caching a pool's logs"""
+    return os.path.join(CACHE_DIR, f"{pool_address.lower()}.parquet")
+
+def load_cached_events(pool_address: str) -> Tuple[List[Dict], int]:
+    """Load a pool's cached events and the last block they cover (-1 if nothing is cached)"""
+    path = get_cache_path(pool_address)
+    if not os.path.exists(path):
+        return [], -1
+    
+    table = pq.read_table(path)
+    last_scanned_block = int(table.schema.metadata[b"last_scanned_block"])
+    # Older caches may hold checksummed addresses; normalize them in one columnar pass
+    table = table.set_column(
+        table.schema.get_field_index("address"), "address", pc.utf8_lower(table.column("address"))
+    )
+    events = [
+        {
+            "pool": pool_address,
+            "tx_hash": row["tx_hash"],
+            "block_number": row["block_number"],
+            "address": row["address"],
+            "amount_in": int(row["amount_in"]),
+            "log_index": row["log_index"]
+        }
+        for row in table.to_pylist()
+    ]
+    return events, last_scanned_block
+
+def save_cached_events(pool_address: str, events: List[Dict], last_scanned_block: int):
+    """Write a pool's events to its parquet cache, replacing the previous file atomically"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    table = pa.Table.from_pydict({
+        "block_number": [event["block_number"] for event in events],
+        "log_index": [event["log_index"] for event in events],
+        "tx_hash": [event["tx_hash"] for event in events],
+        "address": [event["address"] for event in events],
+        "amount_in": [str(event["amount_in"]) for event in events],
+    }, schema=CACHE_SCHEMA.with_metadata({"last_scanned_block": str(last_scanned_block)}))
+    
+    path = get_cache_path(pool_address)
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def get_pool_events_incremental(pool_address: str, to_block: int) -> List[Dict]:
+    """Fetch a pool's events, reading confirmed history from the cache and only scanning newer blocks"""
+    cached_events, last_scanned_block = load_cached_events(pool_address)
+    
+    new_events = []
+    if last_scanned_block < to_block:
+        new_events = get_pool_events(pool_address, last_scanned_block + 1, to_block)
+    
+    # Persist only blocks that are deep enough to be final
+    safe_block = to_block - CONFIRMATIONS
+    if safe_block > last_scanned_block:
+        confirmed_events = [event for event in new_events if event["block_number"] <= safe_block]
+        save_cached_events(pool_address, cached_events + confirmed_events, safe_block)
+    
+    return cached_events + new_events
+
+def calculate_volumes(all_events: List[Dict]) -> pd.DataFrame:
+    """Calculate trading volumes per address and per collection
+    
+    Returns a frame indexed by lowercase address with one volume column per collection,
+    plus total_volume and tx_count columns.
+    """
     collection_map = {
         POOLS["YEETARD"]: "YEETARD",
         POOLS["BULLA_1"]: "BULLA",
@@ -95,62 +344,67 @@ def calculate_volumes(all_events: List[Dict]) -> Dict[str, Dict[str, Any]]:
         POOLS["BABY_BERA"]: "BABY_BERA"
     }
     
-    for event in all_events:
-        address = event["address"].lower()
-        pool = event["pool"]
-        volume = event["amount_in"] / 1e18  # Convert from wei to BERA
-        collection = collection_map[pool]
-        
-        address_data[address]["total_volume"] += volume
-        address_data[address]["collections"][collection] += volume
-        address_data[address]["tx_count"] += 1
-    
-    return dict(address_data)
-
-def distribute_by_collection(address_data: Dict[str, Dict[str, Any]], total_tokens: float) -> Dict[str, float]:
-    """Distribute tokens by allocating 1/3 to each collection, then by volume within each"""
-    # Group addresses by collection and calculate volumes
-    collection_volumes = {
-        "YEETARD": {},
-        "BULLA": {},
-        "BABY_BERA": {}
-    }
+    if not all_events:
+        return pd.DataFrame(columns=COLLECTIONS + ["total_volume", "tx_count"])
     
-    for address, data in address_data.items():
-        for collection, volume in data["collections"].items():
-            if volume > 0:
-                collection_volumes[collection][address] = volume
+    df = pd.DataFrame(all_events)
+    # Addresses are lowercased at fetch time; categorical codes make the groupbys cheaper
+    df["address"] = df["address"].astype("category")
+    df["collection"] = df["pool"].map(collection_map)
+    df["volume"] = df["amount_in"].astype(float) / 1e18  # Convert from wei to BERA
     
-    # Calculate tokens per collection (1/3 each)
-    tokens_per_collection = total_tokens / 3
+    address_data = (
+        df.groupby(["address", "collection"], observed=True)["volume"].sum()
+        .unstack(fill_value=0)
+        .reindex(columns=COLLECTIONS, fill_value=0)
+    )
+    address_data["total_volume"] = address_data[COLLECTIONS].sum(axis=1)
+    address_data["tx_count"] = df.groupby("address", observed=True).size()
     
-    distribution = defaultdict(float)
+    return address_data
+
+def distribute_by_collection(collection_volumes: np.ndarray, total_tokens: float) -> np.ndarray:
+    """Distribute tokens by allocating 1/3 to each collection, then by volume within each
     
-    # Distribute within each collection based on volume
-    for collection, addresses in collection_volumes.items():
-        total_collection_volume = sum(addresses.values())
-        
-        if total_collection_volume > 0:
-            for address, volume in addresses.items():
-                allocation = (volume / total_collection_volume) * tokens_per_collection
-                distribution[address] += allocation
+    collection_volumes is an (addresses x collections) matrix; returns one allocation per address.
+    """
+    # Calculate tokens per collection (1/3 each)
+    tokens_per_collection = total_tokens / len(COLLECTIONS)
+    
+    # Distribute within each collection based on volume, skipping collections with no volume
+    collection_totals = collection_volumes.sum(axis=0)
+    safe_totals = np.where(collection_totals > 0, collection_totals, 1)
+    shares = np.where(collection_totals > 0, collection_volumes / safe_totals, 0)
     
-    return dict(distribution)
+    return (shares * tokens_per_collection).sum(axis=1)
 
-def distribute_by_total_volume(address_data: Dict[str, Dict[str, Any]], total_tokens: float) -> Dict[str, float]:
+def distribute_by_total_volume(total_volumes: np.ndarray, total_tokens: float) -> np.ndarray:
     """Distribute all tokens based on total trading volume across all pools"""
-    total_volume = sum(data["total_volume"] for data in address_data.values())
-    
-    distribution = {}
-    for address, data in address_data.items():
-        if total_volume > 0:
-            distribution[address] = (data["total_volume"] / total_volume) * total_tokens
-        else:
-            distribution[address] = 0
+    total_volume = total_volumes.sum()
     
-    return distribution
+    if total_volume > 0:
+        return total_volumes / total_volume * total_tokens
+    return np.zeros_like(total_volumes)
+
+def to_address_records(address_data: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Convert the per-address volume frame into the plain dicts shared by both distribution outputs"""
+    return {
+        address: {
+            "total_volume_bera": row["total_volume"],
+            "transaction_count": int(row["tx_count"]),
+            "collections_traded": {collection: row[collection] for collection in COLLECTIONS if row[collection] > 0}
+        }
+        for address, row in zip(address_data.index, address_data.to_dict("records"))
+    }
+
+def write_distribution_csv(distribution_df: pd.DataFrame, column: str, filename: str):
+    """Write address,amount rows sorted by allocation, with amounts in wei (18 decimals)"""
+    rows = distribution_df[distribution_df[column] > 0].sort_values(column, ascending=False, kind="stable")
+    # Amounts overflow uint64, so keep them as truncated floats and print them as exact integers
+    rows = rows.assign(amount=np.trunc(rows[column] * 1e18))
+    rows[["address", "amount"]].to_csv(filename, index=False, float_format="%.0f")
 
-def main():
+def main(charts: bool = False):
     """Main function to orchestrate the airdrop calculation"""
     print("Starting Berachain airdrop calculation...")
     print(f"Total BERA to distribute: {TOTAL_BERA_TOKENS}")
@@ -158,11 +412,17 @@ def main():
     
     # Fetch all events
     all_events = []
-    for pool_name, pool_address in POOLS.items():
-        print(f"\nFetching events for {pool_name} pool...")
-        events = get_pool_events(pool_address, from_block=0)
-        all_events.extend(events)
-        print(f"Found {len(events)} events for {pool_name}")
+    to_block = get_block_number()
+    with ThreadPoolExecutor(max_workers=POOL_WORKERS) as executor:
+        futures = {}
+        for pool_name, pool_address in POOLS.items():
+            print(f"\nFetching events for {pool_name} pool...")
+            futures[pool_name] = executor.submit(get_pool_events_incremental, pool_address, to_block)
+        
+        for pool_name, future in futures.items():
+            events = future.result()
+            all_events.extend(events)
+            print(f"Found {len(events)} events for {pool_name}")
     
     print(f"\nTotal events found: {len(all_events)}")
     
@@ -174,30 +434,21 @@ def main():
     # Calculate distributions
     print("\nCalculating token distributions...")
     print("Method 1: By collection (1/3 of 34,000 BERA per collection)")
-    collection_distribution = distribute_by_collection(address_data, TOTAL_BERA_TOKENS)
+    collection_volumes = address_data[COLLECTIONS].to_numpy(dtype=np.float64)
+    total_volumes = address_data["total_volume"].to_numpy(dtype=np.float64)
+    collection_distribution = distribute_by_collection(collection_volumes, TOTAL_BERA_TOKENS)
     
     print("Method 2: By total volume (all 34,000 BERA)")
-    volume_distribution = distribute_by_total_volume(address_data, TOTAL_BERA_TOKENS)
+    volume_distribution = distribute_by_total_volume(total_volumes, TOTAL_BERA_TOKENS)
     
-    # Create separate distribution results
-    collection_based_results = {}
-    volume_based_results = {}
+    # Per-address details are built once and shared; each method only maps address -> allocation
+    address_records = to_address_records(address_data)
+    collection_based_results = dict(zip(address_records, collection_distribution.tolist()))
+    volume_based_results = dict(zip(address_records, volume_distribution.tolist()))
     
-    for address in address_data.keys():
-        collection_based_results[address] = {
-            "allocation": collection_distribution.get(address, 0),
-            "address_data": address_data[address]
-        }
-        volume_based_results[address] = {
-            "allocation": volume_distribution.get(address, 0),
-            "address_data": address_data[address]
-        }
-    
-    # Sort by allocation for both methods
-    sorted_collection = sorted(collection_based_results.items(), 
-                             key=lambda x: x[1]["allocation"], reverse=True)
-    sorted_volume = sorted(volume_based_results.items(), 
-                          key=lambda x: x[1]["allocation"], reverse=True)
+    # Only the top 20 are printed, so there is no need to sort every address
+    top_collection = heapq.nlargest(20, collection_based_results.items(), key=itemgetter(1))
+    top_volume = heapq.nlargest(20, volume_based_results.items(), key=itemgetter(1))
     
     # Output results
     print("\n" + "="*80)
@@ -208,30 +459,27 @@ def main():
     print(f"{'Address':<45} {'BERA Allocation':<15} {'Volume (BERA)':<15}")
     print("-"*75)
     
-    for i, (address, data) in enumerate(sorted_collection[:20]):
-        print(f"{address:<45} {data['allocation']:>14.4f} {data['address_data']['total_volume']:>14.4f}")
+    for address, allocation in top_collection:
+        print(f"{address:<45} {allocation:>14.4f} {address_records[address]['total_volume_bera']:>14.4f}")
     
     print("\n\nMETHOD 2: BY TOTAL VOLUME")
     print(f"{'Address':<45} {'BERA Allocation':<15} {'Volume (BERA)':<15}")
     print("-"*75)
     
-    for i, (address, data) in enumerate(sorted_volume[:20]):
-        print(f"{address:<45} {data['allocation']:>14.4f} {data['address_data']['total_volume']:>14.4f}")
-    
-    # Calculate collection stats
-    collection_stats = {}
-    for collection in ["YEETARD", "BULLA", "BABY_BERA"]:
-        collection_volume = 0
-        collection_traders = 0
-        for address, data in address_data.items():
-            if collection in data["collections"] and data["collections"][collection] > 0:
-                collection_volume += data["collections"][collection]
-                collection_traders += 1
-        collection_stats[collection] = {
-            "total_volume": collection_volume,
-            "unique_traders": collection_traders,
-            "tokens_allocated": TOTAL_BERA_TOKENS / 3
+    for address, allocation in top_volume:
+        print(f"{address:<45} {allocation:>14.4f} {address_records[address]['total_volume_bera']:>14.4f}")
+    
+    # Calculate collection stats from the same volume matrix used for the distribution
+    collection_totals = collection_volumes.sum(axis=0).tolist()
+    collection_traders = (collection_volumes > 0).sum(axis=0).tolist()
+    collection_stats = {
+        collection: {
+            "total_volume": collection_totals[i],
+            "unique_traders": collection_traders[i],
+            "tokens_allocated": TOTAL_BERA_TOKENS / len(COLLECTIONS)
         }
+        for i, collection in enumerate(COLLECTIONS)
+    }
     
     # Save full results to JSON
     output_data = {
@@ -243,49 +491,26 @@ def main():
             "collection_stats": collection_stats
         },
         "distribution_by_collection": {
-            address: {
-                "allocation": data["allocation"],
-                "total_volume_bera": data["address_data"]["total_volume"],
-                "transaction_count": data["address_data"]["tx_count"],
-                "collections_traded": dict(data["address_data"]["collections"])
-            }
-            for address, data in collection_based_results.items()
+            address: {"allocation": allocation, **address_records[address]}
+            for address, allocation in collection_based_results.items()
         },
         "distribution_by_volume": {
-            address: {
-                "allocation": data["allocation"],
-                "total_volume_bera": data["address_data"]["total_volume"],
-                "transaction_count": data["address_data"]["tx_count"],
-                "collections_traded": dict(data["address_data"]["collections"])
-            }
-            for address, data in volume_based_results.items()
+            address: {"allocation": allocation, **address_records[address]}
+            for address, allocation in volume_based_results.items()
         }
     }
     
-    with open("bera_airdrop_distributions.json", "w") as f:
-        json.dump(output_data, f, indent=2)
+    with open("bera_airdrop_distributions.json", "wb") as f:
+        f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     
     # Also save CSV files for both distribution methods
-    
-    # Save collection-based distribution CSV
-    with open("bera_airdrop_collection_based.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["address", "amount"])
-        for address, data in sorted_collection:
-            if data["allocation"] > 0:
-                # Convert to wei (18 decimals)
-                amount_wei = int(data["allocation"] * 1e18)
-                writer.writerow([address, amount_wei])
-    
-    # Save volume-based distribution CSV
-    with open("bera_airdrop_volume_based.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["address", "amount"])
-        for address, data in sorted_volume:
-            if data["allocation"] > 0:
-                # Convert to wei (18 decimals)
-                amount_wei = int(data["allocation"] * 1e18)
-                writer.writerow([address, amount_wei])
+    distribution_df = pd.DataFrame({
+        "address": address_data.index,
+        "coll_alloc": collection_distribution,
+        "vol_alloc": volume_distribution
+    })
+    write_distribution_csv(distribution_df, "coll_alloc", "bera_airdrop_collection_based.csv")
+    write_distribution_csv(distribution_df, "vol_alloc", "bera_airdrop_volume_based.csv")
     
     print(f"\n\nFull results saved to:")
     print(f"  - bera_airdrop_distributions.json")
@@ -300,18 +525,36 @@ def main():
         print(f"{collection:<15} {stats['total_volume']:>14.4f} {stats['unique_traders']:>9} {stats['tokens_allocated']:>14.4f}")
     
     # Verify distributions
-    total_collection_dist = sum(data["allocation"] for data in collection_based_results.values())
-    total_volume_dist = sum(data["allocation"] for data in volume_based_results.values())
+    total_collection_dist = collection_distribution.sum()
+    total_volume_dist = volume_distribution.sum()
     print(f"\nVerification:")
     print(f"Collection-based distribution total: {total_collection_dist:.4f} BERA")
     print(f"Volume-based distribution total: {total_volume_dist:.4f} BERA")
     
     # Create visualizations
-    create_distribution_charts(sorted_collection, sorted_volume)
+    if charts:
+        create_distribution_charts(
+            sort_by_allocation(address_data.index.tolist(), collection_distribution),
+            sort_by_allocation(address_data.index.tolist(), volume_distribution)
+        )
+
+def sort_by_allocation(addresses: List[str], allocations: np.ndarray) -> List[Tuple[str, float]]:
+    """Order (address, allocation) pairs by descending allocation using a stable numpy argsort"""
+    order = np.argsort(-allocations, kind="stable")
+    values = allocations.tolist()
+    return [(addresses[i], values[i]) for i in order.tolist()]
+
+def load_pyplot():
+    """Import pyplot on demand with the non-interactive Agg backend, so headless runs never load matplotlib"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
-def create_distribution_charts(sorted_collection: List[Tuple[str, Dict]], 
-                             sorted_volume: List[Tuple[str, Dict]]):
+def create_distribution_charts(sorted_collection: List[Tuple[str, float]], 
+                             sorted_volume: List[Tuple[str, float]]):
     """Create pie charts for top addresses in each distribution method"""
+    plt = load_pyplot()
     
     # Set up the figure with two subplots
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
@@ -325,13 +568,13 @@ def create_distribution_charts(sorted_collection: List[Tuple[str, Dict]],
     collection_labels = []
     collection_total = 0
     
-    for i, (address, data) in enumerate(sorted_collection):
-        if i < TOP_N and data["allocation"] > 0:
-            collection_data.append(data["allocation"])
-            collection_labels.append(f"{address[:6]}...{address[-4:]}: {data['allocation']:.2f}")
-            collection_total += data["allocation"]
-        elif data["allocation"] > 0:
-            collection_total += data["allocation"]
+    for i, (address, allocation) in enumerate(sorted_collection):
+        if i < TOP_N and allocation > 0:
+            collection_data.append(allocation)
+            collection_labels.append(f"{address[:6]}...{address[-4:]}: {allocation:.2f}")
+            collection_total += allocation
+        elif allocation > 0:
+            collection_total += allocation
     
     # Add "Others" category if there are more addresses
     others_collection = 34000 - collection_total
@@ -344,13 +587,13 @@ def create_distribution_charts(sorted_collection: List[Tuple[str, Dict]],
     volume_labels = []
     volume_total = 0
     
-    for i, (address, data) in enumerate(sorted_volume):
-        if i < TOP_N and data["allocation"] > 0:
-            volume_data.append(data["allocation"])
-            volume_labels.append(f"{address[:6]}...{address[-4:]}: {data['allocation']:.2f}")
-            volume_total += data["allocation"]
-        elif data["allocation"] > 0:
-            volume_total += data["allocation"]
+    for i, (address, allocation) in enumerate(sorted_volume):
+        if i < TOP_N and allocation > 0:
+            volume_data.append(allocation)
+            volume_labels.append(f"{address[:6]}...{address[-4:]}: {allocation:.2f}")
+            volume_total += allocation
+        elif allocation > 0:
+            volume_total += allocation
     
     # Add "Others" category if there are more addresses
     others_volume = 34000 - volume_total
@@ -389,8 +632,9 @@ def create_distribution_charts(sorted_collection: List[Tuple[str, Dict]],
     create_detailed_chart(sorted_volume, "Volume-Based Distribution", 
                          "bera_volume_distribution_detailed.png")
 
-def create_detailed_chart(sorted_data: List[Tuple[str, Dict]], title: str, filename: str):
+def create_detailed_chart(sorted_data: List[Tuple[str, float]], title: str, filename: str):
     """Create a detailed bar chart for a distribution method"""
+    plt = load_pyplot()
     
     TOP_N = 20
     
@@ -398,10 +642,10 @@ def create_detailed_chart(sorted_data: List[Tuple[str, Dict]], title: str, filen
     addresses = []
     allocations = []
     
-    for i, (address, data) in enumerate(sorted_data[:TOP_N]):
-        if data["allocation"] > 0:
+    for address, allocation in sorted_data[:TOP_N]:
+        if allocation > 0:
             addresses.append(f"{address[:6]}...{address[-4:]}")
-            allocations.append(data["allocation"])
+            allocations.append(allocation)
     
     # Create figure
     fig, ax = plt.subplots(figsize=(12, 8))
@@ -435,4 +679,12 @@ def create_detailed_chart(sorted_data: List[Tuple[str, Dict]], title: str, filen
     print(f"Detailed chart saved to {filename}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if DEBUG:
+        # web3 is only needed to double-check the hardcoded topic hash
+        from web3 import Web3
+        assert SWAP_NFT_OUT_PAIR_TOPIC == Web3.to_hex(Web3.keccak(text=SWAP_NFT_OUT_PAIR_SIGNATURE))
+    
+    parser = argparse.ArgumentParser(description="Calculate the Berachain sudoswap airdrop distributions")
+    parser.add_argument("--charts", action="store_true", help="also render distribution charts (requires matplotlib)")
+    args = parser.parse_args()
+    main(charts=args.charts)
\ No newline at end of file